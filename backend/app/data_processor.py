@@ -1,14 +1,19 @@
 import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans, DBSCAN
-from sklearn.decomposition import PCA
-from sklearn.preprocessing import StandardScaler, MinMaxScaler
-from sklearn.feature_extraction.text import CountVectorizer
-from sklearn.metrics import silhouette_score
-import matplotlib.pyplot as plt
-import seaborn as sns
-import io
-import base64
+
+# Use Intel's accelerated scikit-learn kernels when they are installed; the patch
+# only affects sklearn names imported after it, so it must precede those imports
+try:
+    from sklearnex import patch_sklearn
+    patch_sklearn()
+except ImportError:
+    pass
+
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.preprocessing import StandardScaler
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import make_pipeline
+from sklearn.metrics import calinski_harabasz_score
 from typing import Dict, List, Tuple, Optional, Any, Union
 import re
 import logging
@@ -22,6 +27,30 @@ class DataProcessor:
     Advanced data processor for handling natural language queries and data analysis.
     """
     
+    # Keyword patterns for _analyze_query; when several groups match, the earliest group wins.
+    # Keywords start on a word boundary and allow their plural/inflected forms
+    # ("trends", "averages", "compared"), so e.g. "count" still skips "country".
+    _QUERY_TYPE_RE = re.compile(
+        r'\b(?:(?P<aggregation>averages?|means?|sums?|totals?|counts?|aggregat\w*|group by)'
+        r'|(?P<correlation>correlat\w*|relationships?|versus|vs|against|compar\w*)'
+        r'|(?P<filtering>filter\w*|where|only|exclud\w*)'
+        r'|(?P<trend>trend\w*|over time|timeseries|time series|growth))\b'
+    )
+    _CHART_TYPE_RE = re.compile(
+        r'\b(?:(?P<BarChart>bar charts?|bar graphs?|column charts?)'
+        r'|(?P<LineChart>line charts?|line graphs?|trend\w*)'
+        r'|(?P<PieChart>pie charts?|pie graphs?|distributions?)'
+        r'|(?P<ScatterChart>scatter\w*|correlat\w*)'
+        r'|(?P<AreaChart>area charts?|area graphs?))\b'
+    )
+    _AGGREGATION_RE = re.compile(
+        r'\b(?:(?P<mean>averages?|means?)'
+        r'|(?P<sum>sums?|totals?)'
+        r'|(?P<count>counts?)'
+        r'|(?P<max>maxim\w*|max)'
+        r'|(?P<min>minim\w*|min))\b'
+    )
+    
     def __init__(self, data: Union[pd.DataFrame, List[Dict[str, Any]]]):
         """Initialize with either a DataFrame or list of dictionaries."""
         if isinstance(data, pd.DataFrame):
@@ -29,23 +58,66 @@ class DataProcessor:
         else:
             self.df = pd.DataFrame(data)
         
+        # Data-dependent artifacts reused across process_query calls
+        self._cache = {}
+        
         # Analyze data types
         self._analyze_data_types()
         
+    def invalidate_cache(self):
+        """Drop cached artifacts; call after mutating self.df in place."""
+        self._cache = {}
+        self._analyze_data_types()
+    
+    def _cached(self, key: str, compute):
+        """Return the cached value for key, computing it on first use."""
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+    
+    @staticmethod
+    def _to_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Convert a DataFrame to a list of row dictionaries."""
+        cols = df.columns.tolist()
+        return [dict(zip(cols, row)) for row in df.itertuples(index=False, name=None)]
+        
     def _analyze_data_types(self):
         """Analyze and store information about data types."""
         self.numeric_cols = self.df.select_dtypes(include=['number']).columns.tolist()
         self.categorical_cols = self.df.select_dtypes(exclude=['number']).columns.tolist()
         self.datetime_cols = []
+        self._dt_cache = {}
         
-        # Try to convert string columns to datetime
+        # Lowercased column names for matching against queries
+        self._col_lower = {str(col).lower(): col for col in self.df.columns}
+        
+        # Probe a small sample of each string column; the full parse is deferred until needed
         for col in self.categorical_cols:
+            sample = self.df[col].dropna().head(50)
+            if sample.empty:
+                continue
             try:
-                pd.to_datetime(self.df[col])
+                pd.to_datetime(sample, errors='raise')
                 self.datetime_cols.append(col)
-            except:
+            except (ValueError, TypeError):
                 pass
     
+    def _get_datetime(self, col: str) -> pd.Series:
+        """Return a column of self.df parsed as datetime, parsing it at most once."""
+        if col not in self._dt_cache:
+            self._dt_cache[col] = pd.to_datetime(self.df[col], errors='coerce')
+        return self._dt_cache[col]
+    
+    def _get_time_sorted(self) -> pd.DataFrame:
+        """Return self.df with its first datetime column parsed and sorted by it, computed once."""
+        def sort_by_time():
+            time_col = self.datetime_cols[0]
+            df = self.df.copy(deep=False)
+            df[time_col] = self._get_datetime(time_col)
+            return df.sort_values(by=time_col)
+        
+        return self._cached('time_sorted', sort_by_time)
+    
     def process_query(self, query: str, max_points: int = 50) -> Dict[str, Any]:
         """
         Process a natural language query and return appropriate data and insights.
@@ -83,7 +155,7 @@ class DataProcessor:
         # Process data based on query type
         if query_info["query_type"] == "aggregation":
             result = self._handle_aggregation_query(query_info)
-            response["processed_data"] = result.to_dict(orient='records')
+            response["processed_data"] = self._to_records(result)
             response["suggested_visualization"] = query_info["chart_type"]
             
         elif query_info["query_type"] == "filtering":
@@ -91,27 +163,27 @@ class DataProcessor:
             # If still too many points after filtering, reduce
             if len(result) > max_points:
                 result = self._reduce_data(max_points, query_info, df=result)
-            response["processed_data"] = result.to_dict(orient='records')
+            response["processed_data"] = self._to_records(result)
             response["suggested_visualization"] = query_info["chart_type"]
             
         elif query_info["query_type"] == "correlation":
             result, insights = self._handle_correlation_query(query_info)
-            response["processed_data"] = result.to_dict(orient='records')
+            response["processed_data"] = self._to_records(result)
             response["insights"].extend(insights)
             response["suggested_visualization"] = "ScatterChart"
             
         elif query_info["query_type"] == "trend":
             result, insights = self._handle_trend_query(query_info)
-            response["processed_data"] = result.to_dict(orient='records')
+            response["processed_data"] = self._to_records(result)
             response["insights"].extend(insights)
             response["suggested_visualization"] = "LineChart"
             
         else:  # Default case
-            response["processed_data"] = df_reduced.to_dict(orient='records')
+            response["processed_data"] = self._to_records(df_reduced)
             response["suggested_visualization"] = query_info["chart_type"]
         
         # Add general insights about the data
-        general_insights = self._generate_general_insights()
+        general_insights = self._cached('general_insights', self._generate_general_insights)
         response["insights"].extend(general_insights)
         
         # Generate additional charts if appropriate
@@ -140,32 +212,17 @@ class DataProcessor:
             "limit": None
         }
         
-        # Determine query type
-        if any(term in query for term in ["average", "mean", "sum", "total", "count", "aggregate", "group by"]):
-            query_info["query_type"] = "aggregation"
-        elif any(term in query for term in ["correlation", "relationship", "versus", "vs", "against", "compare"]):
-            query_info["query_type"] = "correlation"
-        elif any(term in query for term in ["filter", "where", "only", "exclude"]):
-            query_info["query_type"] = "filtering"
-        elif any(term in query for term in ["trend", "over time", "timeseries", "time series", "growth"]):
-            query_info["query_type"] = "trend"
-        
-        # Determine chart type
-        if any(term in query for term in ["bar chart", "bar graph", "column chart"]):
-            query_info["chart_type"] = "BarChart"
-        elif any(term in query for term in ["line chart", "line graph", "trend"]):
-            query_info["chart_type"] = "LineChart"
-        elif any(term in query for term in ["pie chart", "pie graph", "distribution"]):
-            query_info["chart_type"] = "PieChart"
-        elif any(term in query for term in ["scatter", "scatter plot", "correlation"]):
-            query_info["chart_type"] = "ScatterChart"
-        elif any(term in query for term in ["area chart", "area graph"]):
-            query_info["chart_type"] = "AreaChart"
-        
-        # Try to identify target columns
-        for col in self.df.columns:
-            if col.lower() in query:
-                query_info["target_columns"].append(col)
+        # Determine query type and chart type
+        query_info["query_type"] = self._match_keywords(self._QUERY_TYPE_RE, query, query_info["query_type"])
+        query_info["chart_type"] = self._match_keywords(self._CHART_TYPE_RE, query, query_info["chart_type"])
+        
+        # Try to identify target columns; names that are not a single word fall back to a substring search
+        tokens = set(re.findall(r'\w+', query))
+        mentioned_cols = [
+            col for name, col in self._col_lower.items()
+            if name in tokens or (not name.isidentifier() and name in query)
+        ]
+        query_info["target_columns"] = list(mentioned_cols)
         
         # If no columns found, use heuristics
         if not query_info["target_columns"]:
@@ -181,23 +238,11 @@ class DataProcessor:
                     query_info["target_columns"].append(self.categorical_cols[0])
         
         # Determine aggregation function
-        if "average" in query or "mean" in query:
-            query_info["aggregation"] = "mean"
-        elif "sum" in query or "total" in query:
-            query_info["aggregation"] = "sum"
-        elif "count" in query:
-            query_info["aggregation"] = "count"
-        elif "maximum" in query or "max" in query:
-            query_info["aggregation"] = "max"
-        elif "minimum" in query or "min" in query:
-            query_info["aggregation"] = "min"
+        query_info["aggregation"] = self._match_keywords(self._AGGREGATION_RE, query, None)
         
         # Try to identify group by columns
         if "group by" in query:
-            for col in self.categorical_cols:
-                if col.lower() in query:
-                    query_info["group_by"] = col
-                    break
+            query_info["group_by"] = next((col for col in mentioned_cols if col in self.categorical_cols), None)
         
         # If no explicit group by but we need one, use the first categorical column
         if query_info["query_type"] == "aggregation" and not query_info["group_by"] and self.categorical_cols:
@@ -205,6 +250,15 @@ class DataProcessor:
         
         return query_info
     
+    @staticmethod
+    def _match_keywords(pattern: re.Pattern, query: str, default: Optional[str]) -> Optional[str]:
+        """Return the name of the highest-priority group of pattern found in query."""
+        matched = {match.lastgroup for match in pattern.finditer(query)}
+        for name in sorted(pattern.groupindex, key=pattern.groupindex.get):
+            if name in matched:
+                return name
+        return default
+    
     def _reduce_data(self, max_points: int, query_info: Dict[str, Any], df: Optional[pd.DataFrame] = None) -> pd.DataFrame:
         """
         Intelligently reduce data points while preserving patterns.
@@ -230,145 +284,124 @@ class DataProcessor:
             
         # Otherwise use simple sampling
         else:
-            return df.sample(min(max_points, len(df)))
+            n = min(max_points, len(df))
+            if n == len(df):
+                return df
+            
+            # Keep row order with an evenly strided subsample for trends
+            if query_info["query_type"] == "trend":
+                stride = len(df) // n
+                return df.iloc[:stride * n:stride]
+            
+            idx = np.random.default_rng(42).choice(len(df), n, replace=False)
+            return df.take(idx)
     
     def _reduce_timeseries(self, df: pd.DataFrame, max_points: int, query_info: Dict[str, Any]) -> pd.DataFrame:
         """Reduce time series data while preserving trends."""
         time_col = self.datetime_cols[0]
         
-        # Convert to datetime if not already
-        df = df.copy()
-        df[time_col] = pd.to_datetime(df[time_col])
+        # Only copy the columns the reduction actually reads
+        needed = [time_col]
+        if query_info["target_columns"]:
+            needed.append(query_info["target_columns"][0])
+        if query_info.get("group_by"):
+            needed.append(query_info["group_by"])
+        needed = [col for col in dict.fromkeys(needed) if col in df.columns]
+        
+        # Reuse the parsed, time-sorted frame when reducing the full dataset
+        if df is self.df:
+            df = self._get_time_sorted().loc[:, needed]
+        else:
+            df = df.loc[:, needed].copy()
+            df[time_col] = pd.to_datetime(df[time_col], errors='coerce')
+            df = df.sort_values(by=time_col)
         
-        # Sort by time
-        df = df.sort_values(by=time_col)
+        # Estimate the resample frequency from the time span so we usually aggregate once
+        freqs = ['D', 'W', 'M']
+        span = df[time_col].max() - df[time_col].min()
+        span_days = 0 if pd.isna(span) else span.days
+        if span_days <= max_points:
+            start = 0
+        elif span_days / 7 <= max_points:
+            start = 1
+        else:
+            start = 2
         
-        # If we have a group by column, use it
-        if query_info["group_by"]:
-            # Group by time and the group by column
-            group_cols = [pd.Grouper(key=time_col, freq='D'), query_info["group_by"]]
-            
-            # If we have a target column for aggregation, use it
-            if query_info["target_columns"] and query_info["aggregation"]:
-                target_col = query_info["target_columns"][0]
-                agg_func = query_info["aggregation"]
-                
-                # Aggregate
-                result = df.groupby(group_cols)[target_col].agg(agg_func).reset_index()
-                
-                # If still too many points, increase the frequency
-                if len(result) > max_points:
-                    # Try weekly
-                    group_cols[0] = pd.Grouper(key=time_col, freq='W')
-                    result = df.groupby(group_cols)[target_col].agg(agg_func).reset_index()
-                    
-                    # If still too many, try monthly
-                    if len(result) > max_points:
-                        group_cols[0] = pd.Grouper(key=time_col, freq='M')
-                        result = df.groupby(group_cols)[target_col].agg(agg_func).reset_index()
-                
-                return result
-            
-            # If no target column, just count
-            else:
-                result = df.groupby(group_cols).size().reset_index(name='count')
-                
-                # If still too many points, increase the frequency
-                if len(result) > max_points:
-                    # Try weekly
-                    group_cols[0] = pd.Grouper(key=time_col, freq='W')
-                    result = df.groupby(group_cols).size().reset_index(name='count')
-                    
-                    # If still too many, try monthly
-                    if len(result) > max_points:
-                        group_cols[0] = pd.Grouper(key=time_col, freq='M')
-                        result = df.groupby(group_cols).size().reset_index(name='count')
-                
-                return result
+        group_col = query_info["group_by"]
+        target_col = query_info["target_columns"][0] if query_info["target_columns"] else None
+        agg_func = query_info["aggregation"]
         
-        # If no group by, just resample the time series
-        else:
-            # Set the time column as index
+        # If no group by, resample on a time index
+        if not group_col:
             df = df.set_index(time_col)
-            
-            # If we have a target column for aggregation, use it
-            if query_info["target_columns"] and query_info["aggregation"]:
-                target_col = query_info["target_columns"][0]
-                agg_func = query_info["aggregation"]
-                
-                # Resample
-                result = df[target_col].resample('D').agg(agg_func).reset_index()
-                
-                # If still too many points, increase the frequency
-                if len(result) > max_points:
-                    # Try weekly
-                    result = df[target_col].resample('W').agg(agg_func).reset_index()
-                    
-                    # If still too many, try monthly
-                    if len(result) > max_points:
-                        result = df[target_col].resample('M').agg(agg_func).reset_index()
-                
-                return result
-            
-            # If no target column, just count
-            else:
-                result = df.resample('D').size().reset_index(name='count')
-                
-                # If still too many points, increase the frequency
-                if len(result) > max_points:
-                    # Try weekly
-                    result = df.resample('W').size().reset_index(name='count')
-                    
-                    # If still too many, try monthly
-                    if len(result) > max_points:
-                        result = df.resample('M').size().reset_index(name='count')
-                
-                return result
+        
+        def aggregate(freq: str) -> pd.DataFrame:
+            # If we have a group by column, group by time and the group by column
+            if group_col:
+                group_cols = [pd.Grouper(key=time_col, freq=freq), group_col]
+                grouped = df.groupby(group_cols, sort=False, observed=True, as_index=False)
+                if target_col and agg_func:
+                    return grouped[target_col].agg(agg_func)
+                return grouped.size().rename(columns={'size': 'count'})
+            
+            # Otherwise resample the time series
+            if target_col and agg_func:
+                return df[target_col].resample(freq).agg(agg_func).reset_index()
+            return df.resample(freq).size().reset_index(name='count')
+        
+        # Fall back to coarser frequencies only if group cardinality blows the estimate
+        for freq in freqs[start:]:
+            result = aggregate(freq)
+            if len(result) <= max_points:
+                break
+        
+        return result
     
     def _reduce_with_clustering(self, df: pd.DataFrame, max_points: int) -> pd.DataFrame:
         """Reduce data using clustering techniques."""
         # Extract numeric data for clustering
-        numeric_data = df[self.numeric_cols].copy()
-        
-        # Handle missing values
-        numeric_data = numeric_data.fillna(numeric_data.mean())
+        numeric_data = df[self.numeric_cols].to_numpy(dtype=np.float64, na_value=np.nan)
         
-        # Standardize the data
+        # Fill missing values with column means and standardize in one pass
         scaler = StandardScaler()
-        scaled_data = scaler.fit_transform(numeric_data)
+        pipeline = make_pipeline(SimpleImputer(strategy='mean', keep_empty_features=True), scaler)
+        scaled_data = np.ascontiguousarray(pipeline.fit_transform(numeric_data))
         
         # Determine optimal number of clusters (up to max_points)
         n_clusters = min(max_points, len(df))
+        n_init = 10
         
         # If we have many data points, try to find optimal number of clusters
         if len(df) > 1000 and n_clusters > 10:
             # Sample data for faster computation
-            sample_indices = np.random.choice(len(scaled_data), min(1000, len(scaled_data)), replace=False)
+            sample_indices = np.random.choice(len(scaled_data), min(500, len(scaled_data)), replace=False)
             sample_data = scaled_data[sample_indices]
             
             # Try different numbers of clusters
-            silhouette_scores = []
+            scores = []
             cluster_range = range(5, min(50, n_clusters), 5)
             
             for n in cluster_range:
-                kmeans = KMeans(n_clusters=n, random_state=42, n_init=10)
+                # Mini-batch K-means is accurate enough for ranking candidates
+                kmeans = MiniBatchKMeans(n_clusters=n, random_state=42, batch_size=256, n_init=3)
                 cluster_labels = kmeans.fit_predict(sample_data)
                 
                 # Skip if only one cluster
                 if len(np.unique(cluster_labels)) <= 1:
-                    silhouette_scores.append(0)
+                    scores.append(0)
                     continue
                 
-                silhouette_avg = silhouette_score(sample_data, cluster_labels)
-                silhouette_scores.append(silhouette_avg)
+                # Calinski-Harabasz is O(n*k), unlike the O(n^2) silhouette score
+                scores.append(calinski_harabasz_score(sample_data, cluster_labels))
             
             # Find the best number of clusters
-            if silhouette_scores:
-                best_n_clusters = cluster_range[np.argmax(silhouette_scores)]
+            if scores:
+                best_n_clusters = cluster_range[np.argmax(scores)]
                 n_clusters = min(best_n_clusters, n_clusters)
+                n_init = 1
         
         # Apply K-means clustering
-        kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
+        kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=n_init, copy_x=False)
         clusters = kmeans.fit_predict(scaled_data)
         
         # Get cluster centers and convert back to original scale
@@ -380,16 +413,50 @@ class DataProcessor:
         # Add categorical columns (using mode of each cluster)
         for col in df.columns:
             if col not in self.numeric_cols:
-                # For each cluster, find the most common value
-                modes = []
-                for i in range(len(centers_df)):
-                    cluster_values = df.loc[clusters == i, col]
-                    mode_value = cluster_values.mode()[0] if not cluster_values.empty else None
-                    modes.append(mode_value)
-                centers_df[col] = modes
+                centers_df[col] = self._cluster_modes(df[col], clusters, len(centers_df))
         
         return centers_df
     
+    # Largest cluster-by-category count matrix built densely in _cluster_modes
+    _MAX_DENSE_MODE_COUNTS = 1_000_000
+    
+    @staticmethod
+    def _cluster_modes(values: pd.Series, clusters: np.ndarray, n_clusters: int) -> np.ndarray:
+        """Return the most common value in each cluster (None for clusters with no values).
+        
+        Ties resolve to the smallest value, as Series.mode() does.
+        """
+        try:
+            # Sorted codes make argmax/lexsort ties pick the smallest value
+            codes, uniques = pd.factorize(values, sort=True)
+        except TypeError:
+            # Values that can't be ordered fall back to first-appearance order
+            codes, uniques = pd.factorize(values)
+        n_cats = max(len(uniques), 1)
+        valid = codes >= 0
+        keys = clusters[valid].astype(np.int64) * n_cats + codes[valid]
+        
+        if n_clusters * n_cats <= DataProcessor._MAX_DENSE_MODE_COUNTS:
+            # Count every (cluster, category) pair with one bincount
+            counts = np.bincount(keys, minlength=n_clusters * n_cats).reshape(n_clusters, n_cats)
+            best = counts.argmax(axis=1)
+            present = counts[np.arange(n_clusters), best] > 0
+        else:
+            # High-cardinality columns: count only the pairs that occur
+            pair_keys, pair_counts = np.unique(keys, return_counts=True)
+            pair_clusters = pair_keys // n_cats
+            order = np.lexsort((-pair_counts, pair_clusters))
+            is_first = np.r_[True, pair_clusters[order][1:] != pair_clusters[order][:-1]]
+            top = order[is_first]
+            best = np.zeros(n_clusters, dtype=np.int64)
+            present = np.zeros(n_clusters, dtype=bool)
+            best[pair_clusters[top]] = pair_keys[top] % n_cats
+            present[pair_clusters[top]] = True
+        
+        modes = np.full(n_clusters, None, dtype=object)
+        modes[present] = np.asarray(uniques, dtype=object)[best[present]]
+        return modes
+    
     def _handle_aggregation_query(self, query_info: Dict[str, Any]) -> pd.DataFrame:
         """Handle aggregation queries (sum, average, count, etc.)."""
         # Default to count if no aggregation specified
@@ -399,35 +466,38 @@ class DataProcessor:
         if query_info["group_by"]:
             group_col = query_info["group_by"]
             
-            # If we have target columns
-            if query_info["target_columns"]:
-                target_col = query_info["target_columns"][0]
+            # The group column can't also be the value column, and only counts
+            # make sense for non-numeric values
+            value_cols = [col for col in query_info["target_columns"] if col != group_col]
+            if agg_func != "count":
+                value_cols = [col for col in value_cols if col in self.numeric_cols]
+            
+            # If we have a value column
+            if value_cols:
+                target_col = value_cols[0]
                 
                 # Group by and aggregate
-                result = self.df.groupby(group_col)[target_col].agg(agg_func).reset_index()
-                result.columns = [group_col, f"{agg_func}_{target_col}"]
+                aggregated = self.df.groupby(group_col, sort=False, observed=True)[target_col].agg(agg_func)
                 
-                # Sort by the aggregated value
-                result = result.sort_values(by=f"{agg_func}_{target_col}", ascending=False)
-                
-                # Limit if specified
+                # Sort by the aggregated value, keeping only the top rows if a limit is specified
                 if query_info["limit"]:
-                    result = result.head(query_info["limit"])
+                    aggregated = aggregated.nlargest(query_info["limit"])
+                else:
+                    aggregated = aggregated.sort_values(ascending=False)
                 
-                return result
+                return aggregated.reset_index(name=f"{agg_func}_{target_col}")
             
-            # If no target columns, just count
+            # If no usable value column, just count
             else:
-                result = self.df.groupby(group_col).size().reset_index(name='count')
-                
-                # Sort by count
-                result = result.sort_values(by='count', ascending=False)
+                counts = self.df.groupby(group_col, sort=False, observed=True).size()
                 
-                # Limit if specified
+                # Sort by count, keeping only the top rows if a limit is specified
                 if query_info["limit"]:
-                    result = result.head(query_info["limit"])
+                    counts = counts.nlargest(query_info["limit"])
+                else:
+                    counts = counts.sort_values(ascending=False)
                 
-                return result
+                return counts.reset_index(name='count')
         
         # If no group by, aggregate the entire dataset
         else:
@@ -457,8 +527,8 @@ class DataProcessor:
     
     def _handle_filtering_query(self, query_info: Dict[str, Any]) -> pd.DataFrame:
         """Handle filtering queries."""
-        # Start with the full DataFrame
-        filtered_df = self.df.copy()
+        # Start with the full DataFrame; selections below return new objects, so no copy is needed
+        filtered_df = self.df
         
         # Apply filter condition if specified
         if query_info["filter_condition"]:
@@ -530,12 +600,11 @@ class DataProcessor:
         if self.datetime_cols:
             time_col = self.datetime_cols[0]
             
-            # Convert to datetime if not already
-            df = self.df.copy()
-            df[time_col] = pd.to_datetime(df[time_col])
-            
-            # Sort by time
-            df = df.sort_values(by=time_col)
+            # Only select the columns the trend reads from the parsed, time-sorted frame
+            needed = [time_col]
+            if query_info["target_columns"]:
+                needed.append(query_info["target_columns"][0])
+            df = self._get_time_sorted().loc[:, list(dict.fromkeys(needed))]
             
             # If we have a target column
             if query_info["target_columns"]:
@@ -592,7 +661,7 @@ class DataProcessor:
         insights.append(f"Dataset has {len(self.df)} rows and {len(self.df.columns)} columns.")
         
         # Missing values
-        missing_values = self.df.isnull().sum().sum()
+        missing_values = int(self.df.isna().to_numpy().sum())
         if missing_values > 0:
             missing_pct = (missing_values / (len(self.df) * len(self.df.columns))) * 100
             insights.append(f"Dataset contains {missing_values} missing values ({missing_pct:.1f}% of all cells).")
@@ -605,13 +674,16 @@ class DataProcessor:
             insights.append(f"{highest_var_col} has the highest variance among numeric columns.")
             
             # Find outliers in numeric columns
-            for col in self.numeric_cols[:2]:  # Limit to first 2 columns
-                q1 = self.df[col].quantile(0.25)
-                q3 = self.df[col].quantile(0.75)
+            outlier_cols = self.numeric_cols[:2]  # Limit to first 2 columns
+            quartiles = self.df[outlier_cols].quantile([0.25, 0.75])
+            for col in outlier_cols:
+                q1 = quartiles.loc[0.25, col]
+                q3 = quartiles.loc[0.75, col]
                 iqr = q3 - q1
                 lower_bound = q1 - 1.5 * iqr
                 upper_bound = q3 + 1.5 * iqr
-                outliers = ((self.df[col] < lower_bound) | (self.df[col] > upper_bound)).sum()
+                values = self.df[col].to_numpy(dtype=np.float64, na_value=np.nan)
+                outliers = int(np.count_nonzero((values < lower_bound) | (values > upper_bound)))
                 
                 if outliers > 0:
                     outlier_pct = (outliers / len(self.df)) * 100
@@ -627,23 +699,37 @@ class DataProcessor:
         
         return insights
     
+    def _correlation_matrix(self) -> pd.DataFrame:
+        """Approximate the numeric correlation matrix on at most 10,000 rows."""
+        data = self.df[self.numeric_cols]
+        if len(data) > 10000:
+            data = data.sample(10000, random_state=0)
+        
+        # Missing values need pandas' pairwise-complete correlation
+        if data.isna().to_numpy().any():
+            return data.corr()
+        
+        # Otherwise one BLAS-backed float32 pass is enough
+        arr = data.to_numpy(dtype=np.float32)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = np.corrcoef(arr, rowvar=False)
+        return pd.DataFrame(corr, index=self.numeric_cols, columns=self.numeric_cols)
+    
     def _generate_additional_charts(self, query_info: Dict[str, Any]) -> List[Dict[str, Any]]:
         """Generate additional charts that might be useful for the query."""
         charts = []
         
         # If we have numeric columns, add a correlation heatmap
         if len(self.numeric_cols) > 1:
-            corr_matrix = self.df[self.numeric_cols].corr()
+            corr_matrix = self._cached('corr', self._correlation_matrix)
             
             # Convert to list of records for frontend
-            corr_data = []
-            for i, col1 in enumerate(corr_matrix.columns):
-                for j, col2 in enumerate(corr_matrix.columns):
-                    corr_data.append({
-                        "column1": col1,
-                        "column2": col2,
-                        "correlation": corr_matrix.iloc[i, j]
-                    })
+            cols = corr_matrix.columns.to_numpy(dtype=object)
+            corr_data = self._to_records(pd.DataFrame({
+                "column1": np.repeat(cols, len(cols)),
+                "column2": np.tile(cols, len(cols)),
+                "correlation": corr_matrix.to_numpy().ravel()
+            }))
             
             charts.append({
                 "type": "HeatmapChart",
@@ -654,34 +740,32 @@ class DataProcessor:
         # If we have categorical columns, add a bar chart of counts
         if self.categorical_cols:
             cat_col = self.categorical_cols[0]
-            value_counts = self.df[cat_col].value_counts().reset_index()
-            value_counts.columns = [cat_col, 'count']
-            
-            # Limit to top 10
-            value_counts = value_counts.head(10)
+            # Top 10 values by count, selected without sorting every unique value
+            value_counts = self._cached(
+                f'top_counts_{cat_col}',
+                lambda: self.df[cat_col].value_counts(sort=False).nlargest(10)
+            ).rename_axis(cat_col).reset_index(name='count')
             
             charts.append({
                 "type": "BarChart",
                 "title": f"Top 10 {cat_col} by Count",
-                "data": value_counts.to_dict(orient='records')
+                "data": self._to_records(value_counts)
             })
         
         # If we have datetime columns, add a line chart of counts over time
         if self.datetime_cols:
             time_col = self.datetime_cols[0]
             
-            # Convert to datetime if not already
-            df = self.df.copy()
-            df[time_col] = pd.to_datetime(df[time_col])
-            
             # Group by month
-            df = df.set_index(time_col)
-            counts_by_time = df.resample('M').size().reset_index(name='count')
+            counts_by_time = self._cached(
+                f'monthly_counts_{time_col}',
+                lambda: self._get_time_sorted()[[time_col]].set_index(time_col).resample('M').size().reset_index(name='count')
+            )
             
             charts.append({
                 "type": "LineChart",
                 "title": "Counts Over Time",
-                "data": counts_by_time.to_dict(orient='records')
+                "data": self._to_records(counts_by_time)
             })
         
         return charts 
\ No newline at end of file
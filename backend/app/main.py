@@ -1,29 +1,65 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Body
+from fastapi import FastAPI, UploadFile, File, HTTPException, Form, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 import pandas as pd
 import numpy as np
-from sklearn.cluster import KMeans
+from sklearn.cluster import MiniBatchKMeans, kmeans_plusplus
 from sklearn.decomposition import PCA
-from sklearn.preprocessing import StandardScaler
 import json
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple, Callable, TypedDict
 import io
+import os
+import math
+import asyncio
+import hashlib
 import logging
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import asynccontextmanager
 from pydantic import BaseModel
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Custom JSON encoder to handle NaN values
+def _float_or_none(value) -> Optional[float]:
+    # Replace NaN with None (null in JSON)
+    return None if math.isnan(value) else float(value)
+
+def _tolist(value) -> list:
+    return value.tolist()
+
 class NpEncoder(json.JSONEncoder):
+    # Exact-type lookup for the common cell types, checked before the isinstance chain
+    _DISPATCH: Dict[type, Callable[[Any], Any]] = {
+        **{t: int for t in (np.int8, np.int16, np.int32, np.int64,
+                            np.uint8, np.uint16, np.uint32, np.uint64)},
+        **{t: _float_or_none for t in (np.float16, np.float32, np.float64)},
+        np.bool_: bool,
+        np.ndarray: _tolist,
+        pd.Series: _tolist,
+    }
+
     def default(self, obj):
+        handler = self._DISPATCH.get(type(obj))
+        if handler is not None:
+            return handler(obj)
         if isinstance(obj, np.integer):
             return int(obj)
         if isinstance(obj, np.floating):
-            # Replace NaN with None (null in JSON)
-            return None if np.isnan(obj) else float(obj)
+            return _float_or_none(obj)
         if isinstance(obj, np.ndarray):
             return obj.tolist()
         if isinstance(obj, pd.Series):
@@ -32,17 +68,89 @@ class NpEncoder(json.JSONEncoder):
             return None
         return super(NpEncoder, self).default(obj)
 
-# Custom JSONResponse that uses our encoder
+def _orjson_default(obj):
+    """Serialize the pandas/NumPy values orjson does not handle natively."""
+    if isinstance(obj, pd.Series):
+        return obj.tolist()
+    if isinstance(obj, pd.Timestamp):
+        return obj.isoformat()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if pd.api.types.is_scalar(obj) and pd.isna(obj):
+        return None
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps_json(content: Any) -> bytes:
+    """Serialize content to JSON bytes, using orjson when available."""
+    if orjson is not None:
+        # orjson writes NaN as null and serializes NumPy values natively
+        return orjson.dumps(
+            content,
+            default=_orjson_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_NAIVE_UTC,
+        )
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        cls=NpEncoder,
+    ).encode("utf-8")
+
+# Custom JSONResponse that uses orjson when available, falling back to our encoder
 class CustomJSONResponse(JSONResponse):
     def render(self, content: Any) -> bytes:
-        return json.dumps(
-            content,
-            ensure_ascii=False,
-            allow_nan=False,
-            cls=NpEncoder,
-        ).encode("utf-8")
+        return dumps_json(content)
+
+def ndjson_response(metadata: Dict[str, Any], rows: List[Any]) -> StreamingResponse:
+    """Stream the metadata object, then one row per line, as NDJSON."""
+    def lines():
+        yield dumps_json(metadata) + b"\n"
+        for row in rows:
+            yield dumps_json(row) + b"\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+# Worker processes for CPU-bound query processing, started on first use
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+    return _process_pool
+
+def discard_process_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken pool so the next get_process_pool call starts a fresh one."""
+    global _process_pool
+    # Concurrent requests may see the same broken pool; only the first replaces it
+    if _process_pool is pool:
+        _process_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+async def run_in_process_pool(func: Callable[..., Any], *args: Any) -> Any:
+    """Run func in the process pool, replacing the pool if a worker died."""
+    loop = asyncio.get_running_loop()
+    pool = get_process_pool()
+    try:
+        return await loop.run_in_executor(pool, func, *args)
+    except BrokenProcessPool:
+        # A worker was killed (e.g. out of memory), which poisons the whole pool.
+        # The request is not resubmitted: if it caused the crash it would take
+        # the fresh pool down as well.
+        logger.warning("Process pool is broken; replacing it")
+        discard_process_pool(pool)
+        raise RuntimeError("The query worker crashed while processing this request")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global _process_pool
+    yield
+    if _process_pool is not None:
+        _process_pool.shutdown(cancel_futures=True)
+        # A restarted app must not reuse the shut-down pool
+        _process_pool = None
 
-app = FastAPI(title="Data Processing API for Query Playground")
+app = FastAPI(title="Data Processing API for Query Playground", lifespan=lifespan)
 
 # Add CORS middleware with more permissive settings
 app.add_middleware(
@@ -54,10 +162,10 @@ app.add_middleware(
     expose_headers=["*"]
 )
 
-class DataAnalysisRequest(BaseModel):
+class DataAnalysisRequest(TypedDict):
     data: List[Dict[str, Any]]
     query: str
-    max_points: Optional[int] = 50
+    max_points: int
 
 class ColumnInfo(BaseModel):
     name: str
@@ -80,16 +188,22 @@ async def root():
     return {"message": "Data Processing API for Natural Language Query Playground"}
 
 @app.post("/process-data/")
-async def process_data(request: DataAnalysisRequest):
+async def process_data(request: Request, stream: bool = Query(False)):
+    body = await request.body()
     try:
-        # Convert list of dictionaries to DataFrame
-        df = pd.DataFrame(request.data)
+        # Parse and process in a worker process so the event loop stays free;
+        # only the raw body bytes are pickled across
+        result = await run_in_process_pool(process_request_body, body)
         
-        # Process the query and data
-        result = process_query(df, request.query, request.max_points)
+        # Stream the rows as NDJSON so large payloads are never rendered in one piece
+        if stream:
+            rows = result["processed_data"].pop("rows")
+            return ndjson_response(result, rows)
         
         # Return with custom JSON response to handle NaN values
         return CustomJSONResponse(content=result)
+    except InvalidRequestBody as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         logger.error(f"Error processing data: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -98,16 +212,14 @@ async def process_data(request: DataAnalysisRequest):
 async def upload_csv(file: UploadFile = File(...)):
     try:
         contents = await file.read()
-        df = pd.read_csv(io.StringIO(contents.decode('utf-8')))
+        # Parse the raw bytes directly rather than decoding into an intermediate string
+        df = with_arrow_strings(pd.read_csv(io.BytesIO(contents), encoding='utf-8'))
         
-        # Replace NaN values with None for JSON serialization
-        df = df.replace({np.nan: None})
-        
-        # Convert DataFrame to list of dictionaries
-        data = df.to_dict(orient='records')
+        # Convert DataFrame to a columnar payload
+        data = dataframe_to_columnar(df)
         
         # Get data summary
-        summary = get_data_summary(df)
+        summary = cached_data_summary(df)
         
         # Return with custom JSON response
         return CustomJSONResponse(content={
@@ -122,20 +234,17 @@ async def upload_csv(file: UploadFile = File(...)):
 async def upload_json(file: UploadFile = File(...)):
     try:
         contents = await file.read()
-        data = json.loads(contents.decode('utf-8'))
+        data = loads_json(contents)
         
         # Convert to DataFrame for processing
-        df = pd.DataFrame(data)
-        
-        # Replace NaN values with None for JSON serialization
-        df = df.replace({np.nan: None})
+        df = with_arrow_strings(pd.DataFrame(data))
         
         # Get data summary
-        summary = get_data_summary(df)
+        summary = cached_data_summary(df)
         
         # Return with custom JSON response
         return CustomJSONResponse(content={
-            "data": df.to_dict(orient='records'),
+            "data": dataframe_to_columnar(df),
             "summary": summary
         })
     except Exception as e:
@@ -143,19 +252,146 @@ async def upload_json(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/analyze-data/")
-async def analyze_data(data: List[Dict[str, Any]] = Body(...)):
+async def analyze_data(request: Request):
     try:
-        df = pd.DataFrame(data)
-        
-        # Replace NaN values with None for JSON serialization
-        df = df.replace({np.nan: None})
+        data = loads_json_body(await request.body())
+    except InvalidRequestBody as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if not isinstance(data, list):
+        raise HTTPException(status_code=422, detail="Request body must be a list of records")
+    try:
+        df = with_arrow_strings(pd.DataFrame(data))
         
-        summary = get_data_summary(df)
+        summary = cached_data_summary(df)
         return CustomJSONResponse(content=summary)
     except Exception as e:
         logger.error(f"Error analyzing data: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def loads_json(contents: bytes) -> Any:
+    """Parse JSON bytes, using orjson when available."""
+    # orjson parses the raw bytes without an intermediate decode
+    if orjson is not None:
+        return orjson.loads(contents)
+    return json.loads(contents.decode('utf-8'))
+
+class InvalidRequestBody(ValueError):
+    """A request body that is not valid JSON or has the wrong shape; endpoints map it to a 422."""
+
+def loads_json_body(body: bytes) -> Any:
+    """Parse a JSON request body, raising InvalidRequestBody for malformed JSON."""
+    try:
+        return loads_json(body)
+    except ValueError as e:
+        raise InvalidRequestBody(f"Invalid JSON body: {str(e)}")
+
+def parse_analysis_request(body: bytes) -> DataAnalysisRequest:
+    """Parse and validate a process-data request body.
+    
+    Rows go straight into a DataFrame, so only the scalar fields are validated.
+    """
+    payload = loads_json_body(body)
+    if not isinstance(payload, dict):
+        raise InvalidRequestBody("Request body must be a JSON object")
+    
+    data = payload.get("data")
+    query = payload.get("query")
+    max_points = payload.get("max_points")
+    if not isinstance(data, list):
+        raise InvalidRequestBody("'data' must be a list of records")
+    if not isinstance(query, str):
+        raise InvalidRequestBody("'query' must be a string")
+    if max_points is None:
+        max_points = 50
+    elif isinstance(max_points, bool) or not isinstance(max_points, int):
+        raise InvalidRequestBody("'max_points' must be an integer")
+    
+    return {"data": data, "query": query, "max_points": max_points}
+
+def with_arrow_strings(df: pd.DataFrame) -> pd.DataFrame:
+    """Store string columns as Arrow-backed strings when pyarrow is available."""
+    if pyarrow is None:
+        return df
+    # Only all-string object columns are converted; mixed columns stay object
+    string_cols = [
+        col for col, dtype in df.dtypes.items()
+        if dtype == object and pd.api.types.infer_dtype(df[col], skipna=True) == 'string'
+    ]
+    if string_cols:
+        df = df.astype({col: pd.StringDtype('pyarrow') for col in string_cols})
+    return df
+
+def dataframe_rows(df: pd.DataFrame) -> List[tuple]:
+    """Convert a DataFrame to row tuples of Python values with missing values as None."""
+    columns = []
+    for _, series in df.items():
+        # Only columns that actually contain missing values pay for the None substitution
+        mask = series.isna()
+        if mask.any():
+            series = series.astype(object).where(~mask, None)
+        columns.append(series.tolist())
+    return list(zip(*columns))
+
+def dataframe_to_columnar(df: pd.DataFrame) -> Dict[str, Any]:
+    """Convert a DataFrame to a columnar payload with missing values as None.
+    
+    Rows are sent as plain lists so each column name is serialized once
+    instead of once per row; the client rebuilds records from ``columns``.
+    """
+    return {
+        "columns": df.columns.tolist(),
+        "dtypes": df.dtypes.astype(str).tolist(),
+        "rows": dataframe_rows(df)
+    }
+
+def numeric_column_mask(df: pd.DataFrame) -> np.ndarray:
+    """Return a boolean mask of the numeric (non-boolean) columns of df."""
+    # Integer, unsigned, float and complex kinds; covers nullable and Arrow dtypes too
+    return df.dtypes.map(lambda dtype: dtype.kind in 'iufc').to_numpy(dtype=bool)
+
+# Most recently used summaries, keyed by a fingerprint of the frame's contents
+SUMMARY_CACHE_SIZE = 64
+_summary_cache: "OrderedDict[bytes, Dict]" = OrderedDict()
+
+def data_fingerprint(df: pd.DataFrame) -> Optional[bytes]:
+    """Hash the column names, dtypes and values of a DataFrame.
+    
+    Returns None when the frame can't be fingerprinted reliably: frames
+    without columns, and object columns mixing value types, whose values
+    hash through their string form (so 1 and "1" would collide).
+    """
+    if df.columns.empty:
+        return None
+    
+    column_types = []
+    for col, dtype in df.dtypes.items():
+        inferred = pd.api.types.infer_dtype(df[col], skipna=True) if dtype == object else ''
+        if inferred.startswith('mixed'):
+            return None
+        column_types.append((str(col), str(dtype), inferred))
+    
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr(column_types).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.digest()
+
+def cached_data_summary(df: pd.DataFrame) -> Dict:
+    """Return get_data_summary(df), reusing the result for identical data."""
+    key = data_fingerprint(df)
+    if key is None:
+        return get_data_summary(df)
+    
+    summary = _summary_cache.get(key)
+    if summary is not None:
+        _summary_cache.move_to_end(key)
+        return summary
+    
+    summary = get_data_summary(df)
+    _summary_cache[key] = summary
+    if len(_summary_cache) > SUMMARY_CACHE_SIZE:
+        _summary_cache.popitem(last=False)
+    return summary
+
 def get_data_summary(df: pd.DataFrame) -> Dict:
     """Generate a comprehensive summary of the DataFrame."""
     
@@ -163,35 +399,55 @@ def get_data_summary(df: pd.DataFrame) -> Dict:
     row_count = len(df)
     column_count = len(df.columns)
     
+    # Classify columns from one dtype scan; booleans get statistics
+    # but are left out of the correlation matrix
+    is_num = numeric_column_mask(df)
+    numeric_cols = df.columns[is_num].tolist()
+    
+    # Compute statistics for all columns at once
+    is_bool = df.dtypes.map(lambda dtype: dtype.kind == 'b').to_numpy(dtype=bool)
+    stat_cols = df.columns[is_num | is_bool].tolist()
+    stats = df[stat_cols].agg(['min', 'max', 'mean', 'median']).T if stat_cols else None
+    unique_counts = df.nunique(dropna=True)
+    
+    # Draw the sample rows once for all columns
+    rng = np.random.default_rng(0)
+    sample_size = min(5, row_count)
+    sample_idx = rng.choice(row_count, size=sample_size, replace=False)
+    samples = df.iloc[sample_idx].to_dict('list')
+    
     # Column information
     columns = []
-    for col in df.columns:
+    for col, dtype in df.dtypes.items():
         col_info = {
             "name": col,
-            "type": str(df[col].dtype),
-            "unique_values": df[col].nunique(),
-            "sample_values": df[col].dropna().sample(min(5, len(df))).tolist() if not df[col].empty else []
+            "type": str(dtype),
+            "unique_values": int(unique_counts[col]),
+            "sample_values": [value for value in samples[col] if not pd.isna(value)]
         }
         
         # Add numerical statistics if applicable
-        if pd.api.types.is_numeric_dtype(df[col]):
+        if stats is not None and col in stats.index:
             col_info.update({
-                "min_value": float(df[col].min()) if not df[col].empty and not pd.isna(df[col].min()) else None,
-                "max_value": float(df[col].max()) if not df[col].empty and not pd.isna(df[col].max()) else None,
-                "mean_value": float(df[col].mean()) if not df[col].empty and not pd.isna(df[col].mean()) else None,
-                "median_value": float(df[col].median()) if not df[col].empty and not pd.isna(df[col].median()) else None
+                f"{stat}_value": None if pd.isna(value) else float(value)
+                for stat, value in stats.loc[col].items()
             })
         
         columns.append(col_info)
     
     # Calculate correlation matrix for numerical columns
     correlation_matrix = None
-    numeric_cols = df.select_dtypes(include=['number']).columns
     if len(numeric_cols) > 1:
-        corr_df = df[numeric_cols].corr()
-        # Replace NaN values with None for JSON serialization
-        corr_df = corr_df.fillna(0)  # Replace NaN with 0 in correlation matrix
-        correlation_matrix = corr_df.to_dict(orient='dict')
+        # Fill missing values with column means and correlate in a single NumPy pass
+        arr = df[numeric_cols].to_numpy(dtype=np.float64, na_value=np.nan)
+        missing = np.isnan(arr)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if missing.any():
+                arr = np.where(missing, np.nanmean(arr, axis=0), arr)
+            corr = np.corrcoef(arr, rowvar=False)
+        # Replace NaN with 0 in correlation matrix for JSON serialization
+        corr = np.nan_to_num(corr, nan=0.0)
+        correlation_matrix = {col: dict(zip(numeric_cols, row)) for col, row in zip(numeric_cols, corr.tolist())}
     
     return {
         "row_count": row_count,
@@ -200,12 +456,24 @@ def get_data_summary(df: pd.DataFrame) -> Dict:
         "correlation_matrix": correlation_matrix
     }
 
+def process_request_body(body: bytes) -> Dict:
+    """Parse a process-data request body, build the DataFrame and process the query.
+    
+    Takes the raw body rather than parsed records so only bytes are pickled
+    into the worker process; an invalid body raises InvalidRequestBody.
+    """
+    payload = parse_analysis_request(body)
+    
+    # Convert list of dictionaries to DataFrame
+    df = with_arrow_strings(pd.DataFrame(payload["data"]))
+    return process_query(df, payload["query"], payload["max_points"])
+
 def process_query(df: pd.DataFrame, query: str, max_points: int = 50) -> Dict:
     """Process the natural language query and return appropriate data."""
     
-    # Default response structure
+    # Default response structure; processed_data is columnar even when there are no rows
     response = {
-        "processed_data": [],
+        "processed_data": dataframe_to_columnar(df.iloc[:0]),
         "insights": [],
         "suggested_visualization": None
     }
@@ -215,18 +483,24 @@ def process_query(df: pd.DataFrame, query: str, max_points: int = 50) -> Dict:
         response["insights"].append("The dataset is empty.")
         return response
     
-    # Determine numeric and categorical columns
-    numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-    categorical_cols = df.select_dtypes(exclude=['number']).columns.tolist()
+    # Determine numeric and categorical columns from a single dtype scan
+    is_num = numeric_column_mask(df)
+    numeric_cols = df.columns[is_num].tolist()
+    categorical_cols = df.columns[~is_num].tolist()
     
     # Basic data reduction - if too many points, use clustering or sampling
     if len(df) > max_points:
         response["insights"].append(f"Dataset reduced from {len(df)} to {max_points} points for visualization.")
         
-        # If we have numeric columns, use K-means clustering
-        if len(numeric_cols) >= 2:
-            df_reduced = reduce_data_kmeans(df, max_points, numeric_cols)
+        # If we have numeric columns, use K-means clustering on the informative ones
+        feature_cols = clustering_features(df, numeric_cols) if len(numeric_cols) >= 2 else []
+        if feature_cols:
+            df_reduced = reduce_data_kmeans(df, max_points, numeric_cols, feature_cols)
             response["insights"].append("K-means clustering was used to reduce data points while preserving patterns.")
+        elif len(numeric_cols) >= 2:
+            # Constant or mostly missing columns give trivial clusters, so sample instead
+            df_reduced = df.sample(n=max_points, random_state=42)
+            response["insights"].append("Random sampling was used to reduce data points because the numeric columns are constant or mostly missing.")
         else:
             # Simple random sampling if not enough numeric columns
             df_reduced = df.sample(max_points)
@@ -234,17 +508,17 @@ def process_query(df: pd.DataFrame, query: str, max_points: int = 50) -> Dict:
     else:
         df_reduced = df
     
-    # Replace NaN values with None for JSON serialization
-    df_reduced = df_reduced.replace({np.nan: None})
-    
-    # Convert the reduced DataFrame to records
-    response["processed_data"] = df_reduced.to_dict(orient='records')
+    # Convert the reduced DataFrame to a columnar payload
+    response["processed_data"] = dataframe_to_columnar(df_reduced)
     
     # Add basic insights about the data
     if numeric_cols:
-        for col in numeric_cols[:3]:  # Limit to first 3 columns to avoid overwhelming
-            if not pd.isna(df[col].min()) and not pd.isna(df[col].max()) and not pd.isna(df[col].mean()):
-                response["insights"].append(f"{col}: Min={df[col].min():.2f}, Max={df[col].max():.2f}, Mean={df[col].mean():.2f}")
+        # Limit to first 3 columns to avoid overwhelming
+        stats = df[numeric_cols[:3]].agg(['min', 'max', 'mean'])
+        for col in stats.columns:
+            col_min, col_max, col_mean = stats[col]
+            if not (pd.isna(col_min) or pd.isna(col_max) or pd.isna(col_mean)):
+                response["insights"].append(f"{col}: Min={col_min:.2f}, Max={col_max:.2f}, Mean={col_mean:.2f}")
     
     # Suggest visualization based on data types
     if len(numeric_cols) >= 2:
@@ -258,42 +532,146 @@ def process_query(df: pd.DataFrame, query: str, max_points: int = 50) -> Dict:
     
     return response
 
-def reduce_data_kmeans(df: pd.DataFrame, n_clusters: int, numeric_cols: List[str]) -> pd.DataFrame:
-    """Reduce data using K-means clustering."""
+def clustering_features(df: pd.DataFrame, numeric_cols: List[str]) -> List[str]:
+    """Return the numeric columns worth clustering on.
     
-    # Extract numeric data for clustering
-    numeric_data = df[numeric_cols].copy()
+    Constant columns and columns with more than half their values missing
+    carry no structure for K-means, so they are left out.
+    """
+    numeric_data = df[numeric_cols]
+    missing_share = numeric_data.isna().mean().to_numpy()
+    stds = numeric_data.std(ddof=0).to_numpy(dtype=np.float64, na_value=np.nan)
+    # An all-missing column has an undefined std and counts as constant
+    keep = (missing_share <= 0.5) & ~np.isnan(stds) & (stds >= 1e-12)
+    return [col for col, k in zip(numeric_cols, keep) if k]
+
+def reduce_data_kmeans(df: pd.DataFrame, n_clusters: int, numeric_cols: List[str],
+                       feature_cols: Optional[List[str]] = None) -> pd.DataFrame:
+    """Reduce data using K-means clustering.
+    
+    Clusters on feature_cols (all numeric columns by default); the other
+    numeric columns are summarized by their per-cluster means.
+    """
+    if feature_cols is None:
+        feature_cols = numeric_cols
+    
+    # Extract numeric data for clustering into a single float32 array;
+    # float32 halves the working set and is ample precision for plotting
+    scaled_data = df[feature_cols].to_numpy(dtype=np.float32, na_value=np.nan, copy=True)
     
-    # Handle missing values
-    numeric_data = numeric_data.fillna(numeric_data.mean())
+    # Handle missing values in place with the column means
+    missing = np.isnan(scaled_data)
+    if missing.any():
+        col_mean = np.nanmean(scaled_data, axis=0)
+        rows, cols = np.nonzero(missing)
+        scaled_data[rows, cols] = col_mean[cols]
     
-    # Standardize the data
-    scaler = StandardScaler()
-    scaled_data = scaler.fit_transform(numeric_data)
+    # Standardize the data in place, keeping mean/std to undo it on the centers
+    mean = scaled_data.mean(axis=0, dtype=np.float64)
+    std = scaled_data.std(axis=0, dtype=np.float64)
+    std[std == 0] = 1.0
+    scaled_data -= mean.astype(np.float32)
+    scaled_data /= std.astype(np.float32)
     
-    # Apply K-means clustering
-    kmeans = KMeans(n_clusters=min(n_clusters, len(df)), random_state=42, n_init=10)
-    clusters = kmeans.fit_predict(scaled_data)
+    n_clusters = min(n_clusters, len(df))
+    
+    # Small problems skip sklearn's estimator overhead with a direct Lloyd loop
+    if len(df) * max(len(feature_cols), n_clusters) < LLOYD_MAX_CELLS:
+        scaled_centers, clusters = lloyd_kmeans(scaled_data, n_clusters)
+    else:
+        # Apply mini-batch K-means clustering
+        kmeans = MiniBatchKMeans(
+            n_clusters=n_clusters,
+            random_state=42,
+            n_init=3,
+            batch_size=min(1024, len(df)),
+            max_iter=100,
+            reassignment_ratio=0.0
+        )
+        clusters = kmeans.fit_predict(scaled_data)
+        scaled_centers = kmeans.cluster_centers_
     
     # Get cluster centers and convert back to original scale
-    centers = scaler.inverse_transform(kmeans.cluster_centers_)
+    centers = scaled_centers * std + mean
     
     # Create a DataFrame with cluster centers
-    centers_df = pd.DataFrame(centers, columns=numeric_cols)
+    centers_df = pd.DataFrame(centers, columns=feature_cols)
+    
+    # Numeric columns left out of the clustering get their per-cluster means
+    other_cols = [col for col in numeric_cols if col not in feature_cols]
+    if other_cols:
+        means = df[other_cols].groupby(clusters).mean()
+        centers_df[other_cols] = means.reindex(range(len(centers_df))).to_numpy(dtype=np.float64, na_value=np.nan)
+    centers_df = centers_df[numeric_cols]
     
     # Add categorical columns (using mode of each cluster)
-    for col in df.columns:
-        if col not in numeric_cols:
-            # For each cluster, find the most common value
-            modes = []
-            for i in range(len(centers_df)):
-                cluster_values = df.loc[clusters == i, col]
-                mode_value = cluster_values.mode()[0] if not cluster_values.empty else None
-                modes.append(mode_value)
-            centers_df[col] = modes
+    cat_cols = [col for col in df.columns if col not in numeric_cols]
+    for col in cat_cols:
+        centers_df[col] = cluster_modes(df[col], clusters, len(centers_df))
     
     return centers_df
 
+def cluster_modes(values: pd.Series, clusters: np.ndarray, n_clusters: int) -> np.ndarray:
+    """Return the most common value in each cluster (None for clusters with no values).
+    
+    Ties resolve to the smallest value, as Series.mode() does.
+    """
+    modes = np.full(n_clusters, None, dtype=object)
+    try:
+        # Sorted codes make ties below pick the smallest value
+        codes, uniques = pd.factorize(values, sort=True)
+    except TypeError:
+        # Values that can't be ordered fall back to first-appearance order
+        codes, uniques = pd.factorize(values)
+    valid = codes >= 0
+    if not valid.any():
+        return modes
+    
+    # Count each (cluster, value) pair that occurs
+    n_cats = len(uniques)
+    pair_keys, pair_counts = np.unique(clusters[valid].astype(np.int64) * n_cats + codes[valid], return_counts=True)
+    pair_clusters = pair_keys // n_cats
+    
+    # Per cluster, take the highest count; equal counts keep the smallest code
+    order = np.lexsort((pair_keys, -pair_counts, pair_clusters))
+    is_first = np.r_[True, pair_clusters[order][1:] != pair_clusters[order][:-1]]
+    top = order[is_first]
+    modes[pair_clusters[top]] = np.asarray(uniques, dtype=object)[pair_keys[top] % n_cats]
+    return modes
+
+# Largest rows x max(features, clusters) handled by lloyd_kmeans
+LLOYD_MAX_CELLS = 500_000
+
+def lloyd_kmeans(X: np.ndarray, n_clusters: int, max_iter: int = 100) -> Tuple[np.ndarray, np.ndarray]:
+    """Run Lloyd's K-means on a small array and return (centers, labels)."""
+    centers, _ = kmeans_plusplus(X, n_clusters, random_state=42)
+    point_norms = np.einsum('ij,ij->i', X, X)
+    # Same convergence tolerance as sklearn: total center shift relative to the data variance
+    tol = 1e-4 * X.var(axis=0).mean()
+    
+    def assign(centers: np.ndarray) -> np.ndarray:
+        # Assign each point to its nearest center using one matrix product
+        distances = point_norms[:, None] - 2 * (X @ centers.T) + np.einsum('ij,ij->i', centers, centers)
+        return distances.argmin(axis=1)
+    
+    for _ in range(max_iter):
+        labels = assign(centers)
+        
+        # Move each center to the mean of its points; empty clusters keep their center
+        counts = np.bincount(labels, minlength=n_clusters)
+        sums = np.column_stack([
+            np.bincount(labels, weights=X[:, j], minlength=n_clusters) for j in range(X.shape[1])
+        ])
+        new_centers = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centers)
+        
+        center_shift = ((new_centers - centers) ** 2).sum()
+        centers = new_centers
+        if center_shift <= tol:
+            break
+    
+    # Label against the final centers so labels and centers agree
+    return centers, assign(centers)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
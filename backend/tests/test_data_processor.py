@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.data_processor import DataProcessor
+
+
+@pytest.fixture
+def processor():
+    df = pd.DataFrame({
+        "region": ["north", "south", "north", "east"],
+        "country": ["a", "b", "c", "d"],
+        "sales": [10.0, 20.0, 30.0, 40.0],
+        "profit": [1.0, 2.0, 3.0, 4.0],
+    })
+    return DataProcessor(df)
+
+
+@pytest.mark.parametrize("query, query_type, chart_type", [
+    ("show sales trends", "trend", "LineChart"),
+    ("sales trend over time", "trend", "LineChart"),
+    ("sales correlated with profit", "correlation", "ScatterChart"),
+    ("sales compared to profit", "correlation", "BarChart"),
+    ("filtered sales", "filtering", "BarChart"),
+    ("sales distribution as a pie chart", "general", "PieChart"),
+])
+def test_match_keywords_query_and_chart_type(processor, query, query_type, chart_type):
+    query_info = processor._analyze_query(query)
+    assert query_info["query_type"] == query_type
+    assert query_info["chart_type"] == chart_type
+
+
+@pytest.mark.parametrize("query, aggregation", [
+    ("what are the averages", "mean"),
+    ("totals by region", "sum"),
+    ("counts per region", "count"),
+    ("maximum sales", "max"),
+    ("minimum profit", "min"),
+])
+def test_match_keywords_aggregation_inflections(processor, query, aggregation):
+    query_info = processor._analyze_query(query)
+    assert query_info["aggregation"] == aggregation
+
+
+@pytest.mark.parametrize("query", ["sales by country", "summary of sales"])
+def test_match_keywords_requires_word_start(processor, query):
+    query_info = processor._analyze_query(query)
+    assert query_info["query_type"] == "general"
+    assert query_info["aggregation"] is None
+
+
+def test_match_keywords_earliest_group_wins():
+    assert DataProcessor._match_keywords(
+        DataProcessor._QUERY_TYPE_RE, "trend of the average", None
+    ) == "aggregation"
+    assert DataProcessor._match_keywords(DataProcessor._QUERY_TYPE_RE, "hello", "general") == "general"
+
+
+def test_aggregation_excludes_group_column(processor):
+    result = processor._handle_aggregation_query(processor._analyze_query("group by region total sales"))
+    assert result.columns.tolist() == ["region", "sum_sales"]
+    assert result.set_index("region")["sum_sales"].to_dict() == {"north": 40.0, "east": 40.0, "south": 20.0}
+
+
+def test_aggregation_without_numeric_value_falls_back_to_counts(processor):
+    result = processor._handle_aggregation_query(processor._analyze_query("group by region average region"))
+    assert result.columns.tolist() == ["region", "count"]
+    assert result.set_index("region")["count"].to_dict() == {"north": 2, "south": 1, "east": 1}
+
+
+@pytest.mark.parametrize("dense_limit", [DataProcessor._MAX_DENSE_MODE_COUNTS, 0])
+def test_cluster_modes_ties_pick_smallest_value(monkeypatch, dense_limit):
+    monkeypatch.setattr(DataProcessor, "_MAX_DENSE_MODE_COUNTS", dense_limit)
+    values = pd.Series(["b", "a", "b", "a", "c", None])
+    clusters = np.array([0, 0, 0, 0, 1, 1])
+
+    modes = DataProcessor._cluster_modes(values, clusters, 3)
+
+    assert modes.tolist() == ["a", "c", None]
@@ -0,0 +1,283 @@
+import asyncio
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.main import (
+    InvalidRequestBody,
+    app,
+    cached_data_summary,
+    cluster_modes,
+    clustering_features,
+    data_fingerprint,
+    dataframe_to_columnar,
+    dumps_json,
+    get_data_summary,
+    lloyd_kmeans,
+    numeric_column_mask,
+    parse_analysis_request,
+    process_query,
+    reduce_data_kmeans,
+    run_in_process_pool,
+)
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+def to_records(payload):
+    """Rebuild records from a columnar payload, as services/api.js does."""
+    return [dict(zip(payload["columns"], row)) for row in payload["rows"]]
+
+
+def test_columnar_round_trip():
+    df = pd.DataFrame({
+        "a": [1, 2, 3],
+        "b": [1.5, np.nan, 3.5],
+        "c": ["x", None, "z"],
+        "d": pd.array([1, None, 3], dtype="Int64"),
+    })
+
+    payload = json.loads(dumps_json(dataframe_to_columnar(df)))
+
+    assert payload["columns"] == ["a", "b", "c", "d"]
+    assert payload["dtypes"] == ["int64", "float64", "object", "Int64"]
+    assert to_records(payload) == [
+        {"a": 1, "b": 1.5, "c": "x", "d": 1},
+        {"a": 2, "b": None, "c": None, "d": None},
+        {"a": 3, "b": 3.5, "c": "z", "d": 3},
+    ]
+
+
+def test_process_query_returns_columnar_data_for_empty_datasets():
+    empty = process_query(pd.DataFrame({"a": pd.Series([], dtype="float64")}), "show data")
+    no_columns = process_query(pd.DataFrame(), "show data")
+
+    assert empty["processed_data"] == {"columns": ["a"], "dtypes": ["float64"], "rows": []}
+    assert no_columns["processed_data"] == {"columns": [], "dtypes": [], "rows": []}
+    assert empty["insights"] == ["The dataset is empty."]
+
+
+def test_summary_correlation_imputes_missing_values_with_column_means():
+    df = pd.DataFrame({
+        "a": [1.0, 2.0, np.nan, 4.0, 5.0],
+        "b": [2.0, 4.0, 6.0, 8.0, 10.0],
+        "label": ["v", "w", "x", "y", "z"],
+    })
+
+    correlation = get_data_summary(df)["correlation_matrix"]
+
+    # The missing value is filled with the mean of a (3.0), making a == b / 2
+    assert list(correlation) == ["a", "b"]
+    assert correlation["a"]["b"] == pytest.approx(1.0)
+    assert correlation["b"]["a"] == pytest.approx(1.0)
+    assert correlation["a"]["a"] == pytest.approx(1.0)
+
+
+def test_summary_correlation_reports_constant_columns_as_zero():
+    df = pd.DataFrame({
+        "a": [1.0, 2.0, 3.0, 4.0],
+        "b": [4.0, 3.0, 2.0, 1.0],
+        "constant": [7.0, 7.0, 7.0, 7.0],
+    })
+
+    correlation = get_data_summary(df)["correlation_matrix"]
+
+    assert correlation["a"]["b"] == pytest.approx(-1.0)
+    assert correlation["a"]["constant"] == 0.0
+    assert correlation["constant"]["b"] == 0.0
+    assert correlation["constant"]["constant"] == 0.0
+
+
+def test_summary_correlation_needs_two_numeric_columns():
+    df = pd.DataFrame({"a": [1.0, 2.0], "label": ["x", "y"]})
+    assert get_data_summary(df)["correlation_matrix"] is None
+
+
+def test_numeric_column_mask_excludes_booleans_and_datetimes():
+    df = pd.DataFrame({
+        "count": pd.array([1, 2, 3], dtype="Int64"),
+        "score": [0.5, 1.5, 2.5],
+        "flag": [True, False, True],
+        "name": ["a", "b", "c"],
+        "when": pd.to_datetime(["2024-01-01", "2024-01-02", "2024-01-03"]),
+    })
+
+    assert numeric_column_mask(df).tolist() == [True, True, False, False, False]
+    assert list(get_data_summary(df)["correlation_matrix"]) == ["count", "score"]
+
+
+def test_cluster_modes_ties_pick_smallest_value():
+    values = pd.Series(["b", "a", "b", "a", "c", None])
+    clusters = np.array([0, 0, 0, 0, 1, 1])
+
+    modes = cluster_modes(values, clusters, 3)
+
+    assert modes.tolist() == ["a", "c", None]
+
+
+def test_reduce_data_kmeans_fills_categorical_columns_with_cluster_modes():
+    df = pd.DataFrame({
+        "x": [0.0, 0.1, 0.2, 0.3, 10.0, 10.1, 10.2, 10.3],
+        "y": [0.0, 0.1, 0.2, 0.3, 10.0, 10.1, 10.2, 10.3],
+        "cat": ["b", "a", "b", "a", "q", "p", "q", "q"],
+    })
+
+    reduced = reduce_data_kmeans(df, 2, ["x", "y"]).sort_values("x")
+
+    assert reduced["cat"].tolist() == ["a", "q"]
+
+
+def test_broken_process_pool_is_replaced_without_resubmitting(monkeypatch):
+    monkeypatch.setattr(main, "_process_pool", None)
+
+    async def run():
+        # os._exit kills the worker, which breaks the pool it ran in
+        with pytest.raises(RuntimeError, match="worker crashed"):
+            await run_in_process_pool(os._exit, 1)
+        assert main._process_pool is None
+        return await run_in_process_pool(abs, -3)
+
+    try:
+        assert asyncio.run(run()) == 3
+    finally:
+        main._process_pool.shutdown()
+
+
+@pytest.mark.parametrize("body", [
+    b"{",
+    b"[]",
+    b'{"data": {}, "query": "q"}',
+    b'{"data": [], "query": "q", "max_points": true}',
+])
+def test_process_data_rejects_invalid_bodies_from_the_worker(client, body):
+    response = client.post("/process-data/", content=body)
+
+    assert response.status_code == 422
+
+
+def test_analyze_data_rejects_malformed_json(client):
+    response = client.post("/analyze-data/", content=b"{")
+
+    assert response.status_code == 422
+    assert response.json()["detail"].startswith("Invalid JSON body")
+
+
+def test_lloyd_kmeans_labels_match_final_centers():
+    X = np.random.default_rng(0).normal(size=(500, 3))
+
+    centers, labels = lloyd_kmeans(X, 8, max_iter=2)
+
+    distances = ((X[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+    assert centers.shape == (8, 3)
+    np.testing.assert_array_equal(labels, distances.argmin(axis=1))
+
+
+def test_process_data_stream_matches_json_response(client):
+    rows = [{"x": float(i), "y": float(i * i % 17), "cat": "abc"[i % 3]} for i in range(200)]
+    body = {"data": rows, "query": "x vs y", "max_points": 10}
+
+    regular = client.post("/process-data/", json=body)
+    streamed = client.post("/process-data/?stream=true", json=body)
+
+    assert streamed.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in streamed.text.splitlines()]
+    metadata, stream_rows = lines[0], lines[1:]
+    expected = regular.json()
+    assert metadata["insights"] == expected["insights"]
+    assert metadata["processed_data"]["columns"] == expected["processed_data"]["columns"]
+    assert "rows" not in metadata["processed_data"]
+    assert stream_rows == expected["processed_data"]["rows"]
+
+
+def test_clustering_features_skips_degenerate_columns():
+    df = pd.DataFrame({
+        "a": np.arange(10.0),
+        "constant": 1.0,
+        "sparse": [np.nan] * 6 + [1.0, 2.0, 3.0, 4.0],
+        "b": np.arange(10.0) ** 2,
+    })
+    assert clustering_features(df, ["a", "constant", "sparse", "b"]) == ["a", "b"]
+    assert clustering_features(df, ["constant", "sparse"]) == []
+
+
+def test_reduce_data_kmeans_keeps_left_out_numeric_columns():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "a": rng.normal(size=200),
+        "b": rng.normal(size=200),
+        "constant": 5.0,
+        "cat": ["x", "y"] * 100,
+    })
+
+    reduced = reduce_data_kmeans(df, 10, ["a", "b", "constant"], ["a", "b"])
+
+    assert reduced.columns.tolist() == ["a", "b", "constant", "cat"]
+    assert len(reduced) == 10
+    assert (reduced["constant"] == 5.0).all()
+    assert reduced["cat"].isin(["x", "y"]).all()
+
+
+def test_parse_analysis_request_defaults_and_validation():
+    payload = parse_analysis_request(b'{"data": [{"a": 1}], "query": "show a"}')
+    assert payload == {"data": [{"a": 1}], "query": "show a", "max_points": 50}
+
+    for body in [b"{", b"[]", b'{"data": {}, "query": "q"}', b'{"data": [], "query": 1}',
+                 b'{"data": [], "query": "q", "max_points": "3"}',
+                 b'{"data": [], "query": "q", "max_points": true}']:
+        with pytest.raises(InvalidRequestBody):
+            parse_analysis_request(body)
+
+
+def test_fingerprint_is_stable_for_equal_frames():
+    df = pd.DataFrame({"a": [1, 2], "b": ["x", "y"]})
+    assert data_fingerprint(df) == data_fingerprint(df.copy())
+
+
+def test_fingerprint_distinguishes_values_and_types():
+    base = data_fingerprint(pd.DataFrame({"a": [1, 2]}))
+    assert base != data_fingerprint(pd.DataFrame({"a": [1, 3]}))
+    assert base != data_fingerprint(pd.DataFrame({"a": [1.0, 2.0]}))
+    assert base != data_fingerprint(pd.DataFrame({"b": [1, 2]}))
+    assert data_fingerprint(pd.DataFrame({"a": pd.Series(["1", "2"], dtype=object)})) != \
+        data_fingerprint(pd.DataFrame({"a": pd.Series([b"1", b"2"], dtype=object)}))
+
+
+def test_fingerprint_skips_frames_it_cannot_key():
+    assert data_fingerprint(pd.DataFrame([{}, {}])) is None
+    assert data_fingerprint(pd.DataFrame({"a": pd.Series([1, "a"], dtype=object)})) is None
+
+
+def test_cached_data_summary_reuses_and_separates_results(monkeypatch):
+    monkeypatch.setattr(main, "_summary_cache", main.OrderedDict())
+    df = pd.DataFrame({"a": [1.0, 2.0, 3.0]})
+
+    first = cached_data_summary(df)
+    assert cached_data_summary(df.copy()) is first
+
+    mixed = cached_data_summary(pd.DataFrame({"a": pd.Series([1, "a"], dtype=object)}))
+    strings = cached_data_summary(pd.DataFrame({"a": pd.Series(["1", "a"], dtype=object)}))
+    assert sorted(map(str, mixed["columns"][0]["sample_values"])) == ["1", "a"]
+    assert 1 in mixed["columns"][0]["sample_values"]
+    assert "1" in strings["columns"][0]["sample_values"]
+
+
+def test_cached_data_summary_without_columns():
+    summary = cached_data_summary(pd.DataFrame([{}, {}]))
+    assert summary["row_count"] == 2
+    assert summary["column_count"] == 0
+    assert summary["columns"] == []
+
+
+def test_analyze_data_without_columns(client):
+    response = client.post("/analyze-data/", json=[{}, {}])
+    assert response.status_code == 200
+    assert response.json()["column_count"] == 0
@@ -4,6 +4,21 @@
 
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000';
 
+/**
+ * Rebuild row records from the backend's columnar payload
+ * @param {Object} table - Columnar payload ({columns, dtypes, rows})
+ * @returns {Array} - Array of row objects keyed by column name
+ */
+export function columnarToRecords({ columns, rows }) {
+  return rows.map((row) => {
+    const record = {};
+    for (let i = 0; i < columns.length; i++) {
+      record[columns[i]] = row[i];
+    }
+    return record;
+  });
+}
+
 /**
  * Upload a CSV file to the backend
  * @param {File} file - The CSV file to upload
@@ -28,7 +43,8 @@ export async function uploadCSV(file) {
       throw new Error(`Failed to upload CSV: ${errorText}`);
     }
 
-    return await response.json();
+    const result = await response.json();
+    return { ...result, data: columnarToRecords(result.data) };
   } catch (error) {
     console.error('Error uploading CSV:', error);
     throw error;
@@ -59,24 +75,70 @@ export async function uploadJSON(file) {
       throw new Error(`Failed to upload JSON: ${errorText}`);
     }
 
-    return await response.json();
+    const result = await response.json();
+    return { ...result, data: columnarToRecords(result.data) };
   } catch (error) {
     console.error('Error uploading JSON:', error);
     throw error;
   }
 }
 
+/**
+ * Read an NDJSON response whose first line is metadata and the rest are rows
+ * @param {Response} response - The fetch response to read
+ * @returns {Promise<Object>} - The metadata object with its rows attached
+ */
+async function readNDJSON(response) {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let metadata = null;
+  const rows = [];
+
+  const handleLine = (line) => {
+    if (!line) {
+      return;
+    }
+    const value = JSON.parse(line);
+    if (metadata === null) {
+      metadata = value;
+    } else {
+      rows.push(value);
+    }
+  };
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) {
+      break;
+    }
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split('\n');
+    buffer = lines.pop();
+    lines.forEach(handleLine);
+  }
+  handleLine(buffer + decoder.decode());
+
+  return {
+    ...metadata,
+    processed_data: { ...metadata.processed_data, rows },
+  };
+}
+
 /**
  * Process data with a natural language query
  * @param {Array} data - The data to process
  * @param {string} query - The natural language query
  * @param {number} maxPoints - Maximum number of data points to return
+ * @param {Object} options - Request options
+ * @param {boolean} options.stream - Stream the processed rows as NDJSON
  * @returns {Promise<Object>} - The processed data and insights
  */
-export async function processQuery(data, query, maxPoints = 50) {
+export async function processQuery(data, query, maxPoints = 50, { stream = false } = {}) {
   try {
-    console.log(`Processing query at ${API_BASE_URL}/process-data/`);
-    const response = await fetch(`${API_BASE_URL}/process-data/`, {
+    const url = `${API_BASE_URL}/process-data/${stream ? '?stream=true' : ''}`;
+    console.log(`Processing query at ${url}`);
+    const response = await fetch(url, {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
@@ -96,7 +158,8 @@ export async function processQuery(data, query, maxPoints = 50) {
       throw new Error(`Failed to process query: ${errorText}`);
     }
 
-    return await response.json();
+    const result = stream ? await readNDJSON(response) : await response.json();
+    return { ...result, processed_data: columnarToRecords(result.processed_data) };
   } catch (error) {
     console.error('Error processing query:', error);
     throw error;